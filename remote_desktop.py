@@ -1,22 +1,299 @@
+import os
 import sys
+import ctypes
+import queue
+import asyncio
+import select
 import socket
+import struct
 import threading
-import zlib
 import numpy as np
 import cv2
+import mss
 import pyautogui
+import simplejpeg
 import time # For frame rate limiting
 
 from PySide6.QtWidgets import (QApplication, QWidget, QPushButton, QLabel, QVBoxLayout,
                                QHBoxLayout, QLineEdit, QFrame, QStatusBar,
                                QGraphicsDropShadowEffect)
-from PySide6.QtCore import (QTimer, Qt, QPropertyAnimation, QEasingCurve, QRect, QPoint,
-                            QObject, Signal, QEvent)
-from PySide6.QtGui import QImage, QPixmap, QFont, QLinearGradient, QPainter, QBrush, QColor, QKeyEvent
+from PySide6.QtCore import (QTimer, Qt, QPropertyAnimation, QEasingCurve, QRect, QRectF, QPoint,
+                            QSize, QObject, Signal, QEvent)
+from PySide6.QtGui import QFont, QLinearGradient, QPainter, QBrush, QColor, QKeyEvent
+from PySide6.QtOpenGL import QOpenGLTexture, QOpenGLTextureBlitter
+from PySide6.QtOpenGLWidgets import QOpenGLWidget
+
+# Target encoded frame size range for adaptive quality (adjust based on network conditions/desired quality)
+TARGET_MIN_FRAME_SIZE = 50000 # bytes
+TARGET_MAX_FRAME_SIZE = 150000 # bytes
+
+# Frame protocol (server -> client): [2-byte screen width][2-byte screen height] then a payload of
+# [2-byte frame width][2-byte frame height][2-byte tile count] followed by, per tile, [2-byte x]
+# [2-byte y][2-byte w][2-byte h][4-byte JPEG length][JPEG]. Only tiles that changed since the
+# previous frame are sent; a full frame is sent as a single tile covering the frame.
+# Frames travel over UDP so a lost packet never stalls the stream behind a TCP retransmit. Each frame
+# is split into datagrams of [4-byte frame id][2-byte fragment index][2-byte fragment count] plus up
+# to VIDEO_DATAGRAM_PAYLOAD bytes; the client drops frames that don't arrive whole and asks for a
+# full frame to resync. While the screen is unchanged the server sends a heartbeat instead: a header
+# with a fragment count of 0 carrying the last frame id, so a client that lost that frame still notices.
+# TCP carries only the client's input and control records.
+# The server streams from UDP port 9999 to wherever the client's hello datagrams ([4-byte token], the
+# token the client also sent in its OP_VIDEO_PORT record) come from, so a NAT or stateful firewall in
+# between lets the stream back in. The client keeps resending its hello, which keeps that path open.
+TILE_SIZE = 64 # pixels
+FULL_FRAME_TILE_RATIO = 0.7 # Above this share of changed tiles, encode the whole frame instead
+FRAME_HEADER_STRUCT = struct.Struct('!HH')
+VIDEO_DATAGRAM_STRUCT = struct.Struct('!IHH')
+VIDEO_DATAGRAM_PAYLOAD = 1400 # bytes; keeps each datagram within a typical 1500-byte MTU
+VIDEO_REASSEMBLY_SLOTS = 4 # Frames the client can be collecting at once, indexed by frame id
+VIDEO_HEARTBEAT_INTERVAL = 1.0 # seconds; how often the server repeats the last frame id while the screen is still
+# Far above any real frame (~50-500KB encoded, 8K screens); anything bigger is corrupt or hostile
+# and is dropped before the client allocates for it
+MAX_FRAME_BYTES = 32 << 20
+MAX_FRAME_FRAGMENTS = MAX_FRAME_BYTES // VIDEO_DATAGRAM_PAYLOAD
+MAX_FRAME_PIXELS = 8192 * 8192
+VIDEO_HELLO_STRUCT = struct.Struct('!i')
+VIDEO_HELLO_INTERVAL = 1.0 # seconds between the client's hello datagrams
+VIDEO_START_TIMEOUT = 5.0 # seconds; the client reports a problem if no frame has arrived by then
+TILE_COUNT_STRUCT = struct.Struct('!HHH')
+TILE_HEADER_STRUCT = struct.Struct('!HHHHI')
+
+# Binary input protocol (client -> server): fixed 12-byte records of [1-byte opcode][1-byte button id]
+# [2-byte key id][4-byte x][4-byte y], so no length prefix is needed. Fields an opcode doesn't use are 0.
+OP_MOUSE_MOVE = 1   # x, y
+OP_MOUSE_CLICK = 2  # button id, x, y
+OP_MOUSE_DOWN = 3   # button id, x, y
+OP_MOUSE_UP = 4     # button id, x, y
+OP_MOUSE_SCROLL = 5 # x carries the scroll clicks
+OP_KEY_DOWN = 6     # key id
+OP_KEY_UP = 7       # key id
+OP_REQUEST_KEYFRAME = 8 # no fields; asks the server to send its next frame in full
+OP_VIDEO_PORT = 9   # x carries the client's UDP port for the video stream, y its hello token
+INPUT_EVENT_STRUCT = struct.Struct('!BBHii')
+MOUSE_BUTTONS = ('left', 'right', 'middle') # Button ids on the wire index into this tuple
+
+# libjpeg-turbo can scale during decode; these divisors keep TILE_SIZE tile positions whole
+DECODE_SCALE_DIVISORS = (8, 4, 2)
+# frame_view events that change its size in device pixels (DevicePixelRatioChange is Qt 6.6+)
+VIEW_SIZE_EVENTS = (QEvent.Resize,) + ((QEvent.DevicePixelRatioChange,) if hasattr(QEvent, 'DevicePixelRatioChange') else ())
+
+# Key ids on the wire index into this tuple of PyAutoGUI key names; only ever append to it,
+# so older peers keep agreeing on the existing ids
+KEY_NAMES = tuple('0123456789abcdefghijklmnopqrstuvwxyz') + (
+    'enter', 'space', 'backspace', 'tab', 'esc', 'up', 'down', 'left', 'right',
+    'shift', 'ctrl', 'alt', 'win', 'capslock', 'numlock', 'scrolllock',
+    'insert', 'delete', 'home', 'end', 'pageup', 'pagedown',
+    'f1', 'f2', 'f3', 'f4', 'f5', 'f6', 'f7', 'f8', 'f9', 'f10', 'f11', 'f12',
+    'printscreen', 'pause', 'apps',
+    '.', ',', '/', '\\', '-', '=', '[', ']', ';', "'", '`', '"', '+', '_',
+    '*', '&', '(', ')', '!', '@', '#', '$', '%', '^', ':', '<', '>', '?', '|', '~', '{', '}',
+    'num0', 'num1', 'num2', 'num3', 'num4', 'num5', 'num6', 'num7', 'num8', 'num9',
+    'numadd', 'numsubtract', 'nummultiply', 'numdivide', 'numdecimal',
+)
+KEY_IDS = {name: key_id for key_id, name in enumerate(KEY_NAMES)}
+
+# Comprehensive mapping of Qt keys to PyAutoGUI key names, built once at import
+# This list can be expanded as needed for more special keys (add new names to KEY_NAMES too)
+QT_KEY_NAMES = {
+    Qt.Key_Return: 'enter', Qt.Key_Enter: 'enter', Qt.Key_Space: 'space',
+    Qt.Key_Backspace: 'backspace', Qt.Key_Tab: 'tab', Qt.Key_Escape: 'esc',
+    Qt.Key_Up: 'up', Qt.Key_Down: 'down', Qt.Key_Left: 'left', Qt.Key_Right: 'right',
+    Qt.Key_Shift: 'shift', Qt.Key_Control: 'ctrl', Qt.Key_Alt: 'alt',
+    Qt.Key_Meta: 'win', # Windows key
+    Qt.Key_CapsLock: 'capslock', Qt.Key_NumLock: 'numlock', Qt.Key_ScrollLock: 'scrolllock',
+    Qt.Key_Insert: 'insert', Qt.Key_Delete: 'delete', Qt.Key_Home: 'home',
+    Qt.Key_End: 'end', Qt.Key_PageUp: 'pageup', Qt.Key_PageDown: 'pagedown',
+    Qt.Key_F1: 'f1', Qt.Key_F2: 'f2', Qt.Key_F3: 'f3', Qt.Key_F4: 'f4',
+    Qt.Key_F5: 'f5', Qt.Key_F6: 'f6', Qt.Key_F7: 'f7', Qt.Key_F8: 'f8',
+    Qt.Key_F9: 'f9', Qt.Key_F10: 'f10', Qt.Key_F11: 'f11', Qt.Key_F12: 'f12',
+    Qt.Key_Print: 'printscreen', Qt.Key_Pause: 'pause', Qt.Key_Menu: 'apps', # Context menu key
+    Qt.Key_Period: '.', Qt.Key_Comma: ',', Qt.Key_Slash: '/',
+    Qt.Key_Backslash: '\\', Qt.Key_Minus: '-', Qt.Key_Equal: '=',
+    Qt.Key_BracketLeft: '[', Qt.Key_BracketRight: ']', Qt.Key_Semicolon: ';',
+    Qt.Key_Apostrophe: "'", Qt.Key_QuoteLeft: '`', # Backtick
+    Qt.Key_QuoteDbl: '"', Qt.Key_Plus: '+', Qt.Key_Underscore: '_',
+    Qt.Key_Asterisk: '*', Qt.Key_Ampersand: '&', Qt.Key_ParenLeft: '(',
+    Qt.Key_ParenRight: ')', Qt.Key_Exclam: '!', Qt.Key_At: '@',
+    Qt.Key_NumberSign: '#', Qt.Key_Dollar: '$', Qt.Key_Percent: '%',
+    Qt.Key_AsciiCircum: '^', Qt.Key_Colon: ':', Qt.Key_Less: '<',
+    Qt.Key_Greater: '>', Qt.Key_Question: '?', Qt.Key_Bar: '|',
+    Qt.Key_AsciiTilde: '~', Qt.Key_BraceLeft: '{', Qt.Key_BraceRight: '}',
+    # No numpad entries: Qt reports numpad keys as the regular Key_0..9, Key_Plus etc.
+    # (with KeypadModifier) and the numpad Enter as Key_Enter, both covered above
+}
+
+# Mouse moves are by far the most frequent command, so they call the platform primitive PyAutoGUI
+# itself uses, skipping its per-call failsafe, pause and tween handling. Clicks and keys keep the wrappers.
+if sys.platform == 'win32':
+    fast_mouse_move = ctypes.windll.user32.SetCursorPos
+elif hasattr(getattr(pyautogui, 'platformModule', None), '_moveTo'):
+    fast_mouse_move = pyautogui.platformModule._moveTo # XTest fake_input on X11, Quartz events on macOS
+else:
+    fast_mouse_move = lambda x, y: pyautogui.moveTo(x, y, duration=0)
+
+# Opcode -> action taking a record's (button id, key id, x, y)
+COMMAND_HANDLERS = {
+    OP_MOUSE_MOVE: lambda b, k, x, y: fast_mouse_move(x, y),
+    OP_MOUSE_CLICK: lambda b, k, x, y: pyautogui.click(x=x, y=y, button=MOUSE_BUTTONS[b]),
+    OP_MOUSE_DOWN: lambda b, k, x, y: pyautogui.mouseDown(x=x, y=y, button=MOUSE_BUTTONS[b]),
+    OP_MOUSE_UP: lambda b, k, x, y: pyautogui.mouseUp(x=x, y=y, button=MOUSE_BUTTONS[b]),
+    OP_MOUSE_SCROLL: lambda b, k, x, y: pyautogui.scroll(x),
+    OP_KEY_DOWN: lambda b, k, x, y: pyautogui.keyDown(KEY_NAMES[k]),
+    OP_KEY_UP: lambda b, k, x, y: pyautogui.keyUp(KEY_NAMES[k]),
+}
+
+# image_label style: the dashed placeholder shown while no stream is running
+IMAGE_LABEL_IDLE_STYLE = """
+    QLabel {
+        background-color: #1A202C;
+        border: 2px dashed #4A5568;
+        border-radius: 15px;
+        color: #A0AEC0;
+        font-size: 20px;
+        font-weight: 500;
+    }
+"""
+FRAME_VIEW_BACKGROUND = (0x1A / 255, 0x20 / 255, 0x2C / 255, 1.0) # #1A202C, around the letterboxed frame
+GL_COLOR_BUFFER_BIT = 0x4000
+
+# Status bar stylesheets, prebuilt per message type so update_status never rebuilds and reparses CSS
+STATUS_COLORS = {
+    'info': '#E2E8F0',    # Light gray for general info
+    'success': '#38A169', # Green for success
+    'error': '#E53E3E'    # Red for errors
+}
+STATUS_BAR_STYLES = {
+    status_type: f"""
+    QStatusBar {{
+        background-color: #2D3748;
+        color: {color};
+        font-size: 15px;
+        padding: 10px;
+        border-top: 1px solid #4A5568;
+        border-radius: 0 0 15px 15px;
+    }}
+"""
+    for status_type, color in STATUS_COLORS.items()
+}
+STATUS_REPEAT_INTERVAL = 0.25 # seconds; identical status messages within this window are dropped
+
+MOUSE_MOVE_INTERVAL_MS = 16 # Client sends at most one mouse move per interval; moves in between are coalesced
+KEYFRAME_REQUEST_INTERVAL = 0.25 # seconds; minimum gap between keyframe requests after lost frames
+
+class FrameView(QOpenGLWidget):
+    """Client view that shows frames as a GL texture, letterboxed and scaled by the GPU.
+
+    Each frame is uploaded into a texture sized to the frame, and paintGL draws it as a
+    textured quad with bilinear filtering, so there is no QPixmap conversion or CPU-side scale.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.texture = None
+        self.blitter = None
+        self.frame_size = None # (width, height) of the frame in the texture; None until one is uploaded
+
+    def initializeGL(self):
+        self.blitter = QOpenGLTextureBlitter()
+        self.blitter.create()
+        self.context().aboutToBeDestroyed.connect(self._release_gl)
+
+    def upload_frame(self, frame):
+        """Copies an RGBX frame (H x W x 4 uint8 array) into the texture and schedules a repaint."""
+        if not self.isValid():
+            return # Not shown yet, so there's no GL context to upload into
+        h, w = frame.shape[:2]
+        self.makeCurrent()
+        try:
+            if self.frame_size != (w, h):
+                if self.texture is not None:
+                    self.texture.destroy()
+                self.texture = QOpenGLTexture(QOpenGLTexture.Target2D)
+                self.texture.setFormat(QOpenGLTexture.RGBA8_UNorm)
+                self.texture.setSize(w, h)
+                self.texture.setMinMagFilters(QOpenGLTexture.Linear, QOpenGLTexture.Linear)
+                self.texture.setWrapMode(QOpenGLTexture.ClampToEdge)
+                self.texture.allocateStorage(QOpenGLTexture.RGBA, QOpenGLTexture.UInt8)
+                self.frame_size = (w, h)
+            # A single glTexSubImage2D straight from the frame buffer. 4-byte pixels match the GPU's own
+            # texel layout, so the driver copies rows as-is instead of expanding RGB to RGBX per pixel.
+            self.texture.setData(QOpenGLTexture.RGBA, QOpenGLTexture.UInt8, frame.ctypes.data)
+        finally:
+            self.doneCurrent()
+        self.update()
+
+    def clear_frame(self):
+        """Drops the current frame, leaving only the background."""
+        if self.texture is not None and self.isValid():
+            self.makeCurrent()
+            self.texture.destroy()
+            self.doneCurrent()
+        self.texture = None
+        self.frame_size = None
+        self.update()
+
+    def frame_rect(self):
+        """Returns the rect the frame is drawn in (fitted with KeepAspectRatio and centred), in widget coordinates."""
+        size = QSize(*self.frame_size).scaled(self.size(), Qt.KeepAspectRatio)
+        return QRectF((self.width() - size.width()) / 2, (self.height() - size.height()) / 2, size.width(), size.height())
+
+    def paintGL(self):
+        gl = self.context().functions()
+        gl.glClearColor(*FRAME_VIEW_BACKGROUND)
+        gl.glClear(GL_COLOR_BUFFER_BIT)
+        if self.texture is None:
+            return
+        self.blitter.bind()
+        self.blitter.blit(self.texture.textureId(), QOpenGLTextureBlitter.targetTransform(self.frame_rect(), self.rect()),
+                          QOpenGLTextureBlitter.OriginTopLeft)
+        self.blitter.release()
+
+    def _release_gl(self):
+        self.makeCurrent()
+        if self.texture is not None:
+            self.texture.destroy()
+            self.texture = None
+            self.frame_size = None
+        self.blitter.destroy()
+        self.doneCurrent()
+
+class FrameAssembly:
+    """Collects the datagram fragments of one video frame on the client."""
+    def __init__(self):
+        self.frame_id = -1
+        self.frag_count = 0
+        self.received = 0 # Distinct fragments received so far
+        self.have = bytearray() # One flag per fragment, so duplicates aren't counted twice
+        self.data = bytearray(256 * 1024) # Reused across frames; grown only if a frame doesn't fit
+        self.size = 0
+
+    def reset(self, frame_id, frag_count):
+        self.frame_id = frame_id
+        self.frag_count = frag_count
+        self.received = 0
+        self.have = bytearray(frag_count)
+        self.size = frag_count * VIDEO_DATAGRAM_PAYLOAD # Trimmed once the last fragment arrives
+        if self.size > len(self.data):
+            self.data = bytearray(self.size)
+
+    def add(self, frag_idx, payload):
+        """Stores one fragment and returns True once the frame is complete."""
+        if frag_idx >= self.frag_count or self.have[frag_idx]:
+            return False
+        offset = frag_idx * VIDEO_DATAGRAM_PAYLOAD
+        self.data[offset:offset + len(payload)] = payload
+        if frag_idx == self.frag_count - 1:
+            self.size = offset + len(payload)
+        self.have[frag_idx] = 1
+        self.received += 1
+        return self.received == self.frag_count
+
 
 # Custom Signal for updating UI from non-GUI threads
 class StatusSignal(QObject):
     message = Signal(str, str) # message, type (info, success, error)
+    frame_ready = Signal(object) # Emitted by the client receive thread with a finished frame buffer
+    keyframe_needed = Signal() # Emitted by the client receive thread when it has lost a frame
+    session_ended = Signal() # Emitted by the client receive thread when it stops on its own
 
 class DJRemoteDesktop(QWidget):
     # Instantiate custom signal
@@ -37,6 +314,9 @@ class DJRemoteDesktop(QWidget):
         self.server_socket = None # To explicitly store server socket
         self.server_connection = None # To store client connection on server
         self.server_address = None # To store client address on server
+        self.video_address = None # Client's (ip, UDP port) for the video stream, from OP_VIDEO_PORT or its hellos
+        self.video_token = None # Token the client's hello datagrams must carry, from its OP_VIDEO_PORT record
+        self.video_socket = None # UDP socket for the video stream, on server and client
         self.local_ip = self._get_local_ip() # Get local IP on startup
 
         # Flags to control threads and application state
@@ -45,8 +325,11 @@ class DJRemoteDesktop(QWidget):
         self.is_streaming = False # Indicates if a screen stream is actively running (server or client receiving)
 
         # Thread references
-        self.input_handler_thread = None
-        self.screen_stream_thread = None # For server's screen capture and sending
+        self.screen_stream_thread = None # Runs the server event loop: accept, frame sending and client input
+        self.capture_thread = None # Server pipeline stage 1: screen capture
+        self.encode_thread = None # Server pipeline stage 2: tile diff + JPEG encode
+        self.stream_stop_event = None # Stops the capture/encode stages of the current connection
+        self.keyframe_requested = False # Set by the client's OP_REQUEST_KEYFRAME; the encoder then sends a full frame
         self.client_receive_thread = None # For client's screen receiving
 
         # Main layout: Sidebar + Content
@@ -276,66 +559,81 @@ class DJRemoteDesktop(QWidget):
                 margin: 20px;
             }
         """)
-        # Apply QGraphicsDropShadowEffect to content frame
-        shadow_effect_content = QGraphicsDropShadowEffect(content_frame)
-        shadow_effect_content.setBlurRadius(20)
-        shadow_effect_content.setXOffset(0)
-        shadow_effect_content.setYOffset(0)
-        shadow_effect_content.setColor(QColor(0, 0, 0, 120))
-        content_frame.setGraphicsEffect(shadow_effect_content)
+        # No QGraphicsDropShadowEffect on the content frame: it hosts the streamed image, and
+        # Qt would re-run the software blur over the whole frame on every streamed repaint
 
 
         content_layout = QVBoxLayout(content_frame)
         content_layout.setContentsMargins(30, 30, 30, 30)
 
         self.image_label = QLabel("Select a mode (Server/Client) to start. ✨")
-        self.image_label.setStyleSheet("""
-            QLabel {
-                background-color: #1A202C;
-                border: 2px dashed #4A5568;
-                border-radius: 15px;
-                color: #A0AEC0;
-                font-size: 20px;
-                font-weight: 500;
-            }
-        """)
+        self.image_label.setStyleSheet(IMAGE_LABEL_IDLE_STYLE)
         self.image_label.setAlignment(Qt.AlignCenter)
         self.image_label.setMinimumHeight(600)
-        self.image_label.setScaledContents(False) # Important for manual scaling in update_frame
-        
-        # Enable mouse tracking on the image label for sending events
-        self.image_label.setMouseTracking(True)
-        self.image_label.installEventFilter(self) # Install event filter to capture mouse events
+
+        # Streamed frames are shown in a GL view, which takes image_label's place while a client streams
+        self.frame_view = FrameView()
+        self.frame_view.setMinimumHeight(600)
+        self.frame_view.hide()
+        # Enable mouse tracking on the frame view for sending events
+        self.frame_view.setMouseTracking(True)
+        self.frame_view.installEventFilter(self) # Install event filter to capture mouse events
 
         # Status Bar
         self.status_bar = QStatusBar()
-        self.status_bar.setStyleSheet("""
-            QStatusBar {
-                background-color: #2D3748;
-                color: #E2E8F0;
-                font-size: 15px;
-                padding: 10px;
-                border-top: 1px solid #4A5568;
-                border-radius: 0 0 15px 15px;
-            }
-        """)
+        self.status_bar.setStyleSheet(STATUS_BAR_STYLES['info'])
+        self.last_status = None # (message, type, time) of the last status shown, for dropping repeats
+        self.status_emit_times = {} # (message, type) -> when _emit_status_throttled last emitted it
         self.status_bar.showMessage("Ready to connect...")
 
         content_layout.addWidget(self.image_label, 1)
+        content_layout.addWidget(self.frame_view, 1)
         content_layout.addWidget(self.status_bar)
 
         main_layout.addWidget(sidebar)
         main_layout.addWidget(content_frame, 1)
         self.setLayout(main_layout)
 
-        # Timer for client updates - now directly connected to a thread for receiving
-        # The QTimer is no longer directly fetching frames, but triggering UI updates
-        self.client_ui_update_timer = QTimer(self)
-        self.client_ui_update_timer.timeout.connect(self._update_image_label_from_buffer)
+        # Client UI updates are driven by the receive thread's frame_ready signal, queued into the
+        # GUI thread. The GL view rescales on the GPU, so resizes need no extra work here.
+        self.status_signal.frame_ready.connect(self._show_frame, Qt.QueuedConnection)
+        self.status_signal.keyframe_needed.connect(self._request_keyframe, Qt.QueuedConnection)
+        # Session cleanup touches frame_view's GL context, so it must run in the GUI thread
+        self.status_signal.session_ended.connect(self.stop_client_session, Qt.QueuedConnection)
+
+        # Mouse moves are throttled: the first is sent at once, later ones within MOUSE_MOVE_INTERVAL_MS
+        # only update pending_mouse_move, which is sent when the timer fires
+        self.pending_mouse_move = None
+        self.mouse_move_timer = QTimer(self)
+        self.mouse_move_timer.setSingleShot(True)
+        self.mouse_move_timer.timeout.connect(self._flush_mouse_move)
         
         # Variables for image buffer
-        self.latest_frame_data = None
-        self.latest_frame_lock = threading.Lock() # To protect latest_frame_data
+        # The receive thread decodes each frame's changed tiles into one of two reusable RGBX buffers
+        # (H x W x 4) and hands the UI thread that buffer, with no copy. The buffers take turns: while
+        # the UI uploads one into frame_view's texture, the next frame is patched into the other,
+        # after first replaying the tiles it missed so it is up to date. frame_consumed is set once
+        # the UI has uploaded the last frame handed over. Until then the receive thread keeps patching
+        # newer frames into the back buffer and hands over only the newest, so it never writes a
+        # buffer the UI is still reading and never stalls the stream waiting on the UI.
+        self.frame_buffers = None
+        self.back_buffer_index = 0 # Index of the buffer the receive thread patches next
+        self.frame_consumed = threading.Event()
+        self.stale_tiles = [] # Tiles the back buffer hasn't seen yet, patched into the other buffer since
+        self.unshown_tiles = [] # Tiles patched into the back buffer since it was last handed over
+        # Reusable client receive buffer for video datagrams, large enough for any UDP datagram
+        self.rx_buf = bytearray(65536)
+        self.rx_view = memoryview(self.rx_buf)
+        self.remote_screen_size = None # Server's native (width, height), sent with every frame
+        # Cached view -> server coordinate mapping for mouse events; reset to None whenever the view
+        # is resized, the displayed frame changes size or the server's screen size changes
+        self.mouse_transform = None
+        # Frames are decoded at 1/decode_scale_divisor size when frame_view is smaller than them. The divisor
+        # only changes on a full frame, so when a resize calls for another one the client requests a keyframe.
+        self.view_size = None # frame_view (width, height) in device pixels, read by the receive thread to pick a decode scale
+        self.decode_frame_size = None # (width, height) of the frames being decoded
+        self.decode_scale_divisor = 1
+        self.requested_scale_divisor = None # Divisor a keyframe was last requested for, until one arrives
 
         # Enhanced status bar animation
         self.status_fade_animation = QPropertyAnimation(self.status_bar, b"windowOpacity")
@@ -348,6 +646,7 @@ class DJRemoteDesktop(QWidget):
         # Store last frame size and quality for adaptive bandwidth
         self.last_frame_size = 0
         self.jpeg_quality = 70 # Initial JPEG quality for server
+        self.scale_factor = 1.0 # Resolution ladder for server frames (1.0x, 0.75x, 0.5x)
         self.frame_rate_limit = 15 # Target FPS for server streaming
 
         # Initial button states
@@ -378,21 +677,13 @@ class DJRemoteDesktop(QWidget):
         self.ip_input.setEnabled(not self.is_server_running and not self.is_client_connected) # Ensure input is disabled when server is running
 
     def update_status(self, message, type='info'):
-        color_map = {
-            'info': '#E2E8F0',    # Light gray for general info
-            'success': '#38A169', # Green for success
-            'error': '#E53E3E'    # Red for errors
-        }
-        self.status_bar.setStyleSheet(f"""
-            QStatusBar {{
-                background-color: #2D3748;
-                color: {color_map.get(type, '#E2E8F0')};
-                font-size: 15px;
-                padding: 10px;
-                border-top: 1px solid #4A5568;
-                border-radius: 0 0 15px 15px;
-            }}
-        """)
+        # Drop rapid repeats of the same message (e.g. error bursts while a connection goes down)
+        now = time.monotonic()
+        if self.last_status and self.last_status[:2] == (message, type) and now - self.last_status[2] < STATUS_REPEAT_INTERVAL:
+            return
+        self.last_status = (message, type, now)
+
+        self.status_bar.setStyleSheet(STATUS_BAR_STYLES.get(type, STATUS_BAR_STYLES['info']))
         self.status_bar.showMessage(message)
 
         # Start fade-in animation
@@ -403,6 +694,21 @@ class DJRemoteDesktop(QWidget):
         # Set timer to hide after a delay
         self.status_hide_timer.start(5000) # Hide after 5 seconds
 
+    def _emit_status_throttled(self, message, type):
+        """Emits a status message from a per-record/per-frame path, dropping repeats within STATUS_REPEAT_INTERVAL.
+
+        update_status drops the same repeats, but only after each one has been queued across
+        threads; dropping them here keeps an error storm from flooding the GUI thread's queue.
+        Repeats are tracked per message, so a storm alternating between a few errors is bounded too.
+        Only called from the server's input loop or the client's receive thread, never both.
+        """
+        now = time.monotonic()
+        key = (message, type)
+        if now - self.status_emit_times.get(key, -STATUS_REPEAT_INTERVAL) < STATUS_REPEAT_INTERVAL:
+            return
+        self.status_emit_times[key] = now
+        self.status_signal.message.emit(message, type)
+
     def _hide_status_bar(self):
         self.status_fade_animation.setStartValue(1.0)
         self.status_fade_animation.setEndValue(0.0)
@@ -429,97 +735,338 @@ class DJRemoteDesktop(QWidget):
         self.screen_stream_thread.start()
 
     def run_server_loop(self):
-        """Main server loop for accepting connections and streaming."""
+        """Server thread entry point: runs the accept/input event loop.
+
+        Accepting and reading client input are multiplexed on one asyncio loop in this
+        thread. Each connection also runs a capture thread and an encode thread connected
+        by a bounded queue; the encode thread sends its frames to the client over UDP.
+        """
+        if sys.platform == 'win32':
+            # Raise the Windows timer resolution to 1ms so frame pacing sleeps are accurate
+            ctypes.windll.winmm.timeBeginPeriod(1)
+        loop = asyncio.new_event_loop()
         try:
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Allow reuse of address
-            self.server_socket.settimeout(1.0) # Set a timeout for accept to allow checking is_server_running flag
-            self.server_socket.bind(('0.0.0.0', 9999))
-            self.server_socket.listen(1)
-            self.status_signal.message.emit(f"Server listening on {self.local_ip}:9999", 'info')
-
-            while self.is_server_running:
-                try:
-                    self.server_connection, self.server_address = self.server_socket.accept()
-                    self.status_signal.message.emit(f"Client connected from {self.server_address[0]}:{self.server_address[1]}", 'success')
-                    self.is_streaming = True # Indicate active streaming to a client
-                    
-                    # Start thread to handle client input (mouse/keyboard)
-                    self.input_handler_thread = threading.Thread(target=self.handle_client_input, args=(self.server_connection,), daemon=True)
-                    self.input_handler_thread.start()
-
-                    try:
-                        last_frame_time = time.time()
-                        while self.is_streaming and self.is_server_running:
-                            # Frame rate limiting
-                            current_time = time.time()
-                            time_to_sleep = (1.0 / self.frame_rate_limit) - (current_time - last_frame_time)
-                            if time_to_sleep > 0:
-                                time.sleep(time_to_sleep)
-                            last_frame_time = time.time()
-
-                            screenshot = pyautogui.screenshot()
-                            frame = np.array(screenshot)
-                            
-                            # Adaptive quality logic
-                            # Target frame size range (adjust based on network conditions/desired quality)
-                            target_min_size = 50000 # bytes
-                            target_max_size = 150000 # bytes
-
-                            if self.last_frame_size > target_max_size:
-                                self.jpeg_quality = max(20, self.jpeg_quality - 5)
-                            elif self.last_frame_size < target_min_size and self.jpeg_quality < 90:
-                                self.jpeg_quality = min(90, self.jpeg_quality + 5)
-
-                            _, buffer = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
-                            data = zlib.compress(buffer)
-                            size = len(data)
-                            self.last_frame_size = size # Update last frame size
-
-                            # Send frame size (8 bytes) then compressed frame data
-                            self.server_connection.sendall(size.to_bytes(8, 'big') + data)
-                    except (socket.error, ConnectionResetError) as e:
-                        self.status_signal.message.emit(f"Server streaming error (client disconnected): {e}", 'error')
-                    except Exception as e:
-                        self.status_signal.message.emit(f"Server streaming general error: {e}", 'error')
-                    finally:
-                        self.is_streaming = False
-                        if self.server_connection:
-                            try:
-                                self.server_connection.shutdown(socket.SHUT_RDWR)
-                                self.server_connection.close()
-                            except OSError:
-                                pass # Socket might already be closed
-                            self.server_connection = None
-                        self.status_signal.message.emit("Client connection closed on server side.", 'info')
-                        # Ensure input handler thread is also stopped if it's running
-                        if self.input_handler_thread and self.input_handler_thread.is_alive():
-                            # The input handler thread will naturally exit when its recv fails
-                            pass 
-                except socket.timeout:
-                    # Timeout on accept, continue loop to check is_server_running flag
-                    continue
-                except OSError as e:
-                    if self.is_server_running: # Only report if we intended to be running
-                        self.status_signal.message.emit(f"Server socket error: {e}", 'error')
-                    break # Exit loop if main server socket has issues
-                except Exception as e:
-                    self.status_signal.message.emit(f"Unhandled server loop error: {e}", 'error')
-                    break
+            loop.run_until_complete(self._serve_clients())
         except Exception as e:
             self.status_signal.message.emit(f"Failed to start server: {e}. Check if port 9999 is free or already in use.", 'error')
         finally:
+            loop.close()
             self.is_server_running = False
+            if sys.platform == 'win32':
+                ctypes.windll.winmm.timeEndPeriod(1)
             if self.server_socket:
                 try:
-                    self.server_socket.shutdown(socket.SHUT_RDWR)
                     self.server_socket.close()
                 except OSError:
                     pass
                 self.server_socket = None
+            if self.video_socket:
+                self.video_socket.close()
+                self.video_socket = None
             self.status_signal.message.emit("Server stopped.", 'info')
             self._update_button_states()
 
+    async def _serve_clients(self):
+        """Accepts clients one at a time and streams to each until it disconnects."""
+        loop = asyncio.get_running_loop()
+
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Allow reuse of address
+        self.server_socket.setblocking(False) # The event loop waits on it instead of a blocking accept
+        self.server_socket.bind(('0.0.0.0', 9999))
+        self.server_socket.listen(1)
+        # Frames go out over UDP from the same port number, where the client's hellos arrive
+        self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.video_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20) # 1MB to absorb frame bursts
+        if hasattr(socket, 'SIO_UDP_CONNRESET'):
+            # Windows: don't fail later reads because a datagram went to a port that has since closed
+            self.video_socket.ioctl(socket.SIO_UDP_CONNRESET, False)
+        self.video_socket.bind(('0.0.0.0', 9999))
+        self.status_signal.message.emit(f"Server listening on {self.local_ip}:9999", 'info')
+
+        while self.is_server_running:
+            try:
+                # Time out on accept periodically to check the is_server_running flag
+                self.server_connection, self.server_address = await asyncio.wait_for(loop.sock_accept(self.server_socket), 1.0)
+            except asyncio.TimeoutError:
+                continue
+            except OSError as e:
+                if self.is_server_running: # Only report if we intended to be running
+                    self.status_signal.message.emit(f"Server socket error: {e}", 'error')
+                break # Exit loop if main server socket has issues
+
+            try:
+                self.status_signal.message.emit(f"Client connected from {self.server_address[0]}:{self.server_address[1]}", 'success')
+                self.is_streaming = True # Indicate active streaming to a client
+                conn = self.server_connection
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Don't Nagle-delay control records
+
+                # Frames go out over UDP from the encode thread, once the client has sent its port or a hello
+                self.video_address = None
+                self.video_token = None
+
+                # Client input (mouse/keyboard) is read by a task on this same loop
+                input_task = loop.create_task(self.handle_client_input(conn))
+
+                # Bounded queue between the pipeline stages; holds at most two raw frames
+                stop_event = threading.Event()
+                self.stream_stop_event = stop_event
+                self.keyframe_requested = False
+                raw_frames = queue.Queue(maxsize=2)
+                try:
+                    self.capture_thread = threading.Thread(target=self._capture_frames, args=(raw_frames, stop_event), daemon=True)
+                    self.encode_thread = threading.Thread(target=self._encode_frames, args=(raw_frames, self.video_socket, stop_event), daemon=True)
+                    self.capture_thread.start()
+                    self.encode_thread.start()
+
+                    # Nothing to send from here; keep serving input until the client leaves or the server stops
+                    while self.is_streaming and self.is_server_running and not stop_event.is_set():
+                        await asyncio.wait((input_task,), timeout=0.5)
+                except (socket.error, ConnectionResetError) as e:
+                    self.status_signal.message.emit(f"Server streaming error (client disconnected): {e}", 'error')
+                except Exception as e:
+                    self.status_signal.message.emit(f"Server streaming general error: {e}", 'error')
+                finally:
+                    self.is_streaming = False
+                    stop_event.set()
+                    input_task.cancel()
+                    await asyncio.gather(input_task, return_exceptions=True)
+                    for worker in (self.capture_thread, self.encode_thread):
+                        if worker and worker.is_alive():
+                            worker.join(timeout=2.0)
+                    if self.server_connection:
+                        try:
+                            self.server_connection.shutdown(socket.SHUT_RDWR)
+                        except OSError:
+                            pass # Socket might already be shut down
+                        self.server_connection.close()
+                        self.server_connection = None
+                    self.status_signal.message.emit("Client connection closed on server side.", 'info')
+            except Exception as e:
+                self.status_signal.message.emit(f"Unhandled server loop error: {e}", 'error')
+                break
+
+    def _capture_frames(self, raw_frames, stop_event):
+        """Pipeline stage 1: captures the screen at frame_rate_limit into raw_frames."""
+        try:
+            # mss is not thread-safe, so the capture handle is owned by this thread
+            with mss.mss() as sct:
+                monitor = sct.monitors[1] # Primary monitor
+                grab = sct.grab
+                # Frame rate limiting against absolute monotonic deadlines, so a slow frame
+                # doesn't eat into the next one's budget and timing doesn't drift
+                period = 1.0 / self.frame_rate_limit
+                next_deadline = time.monotonic()
+                while not stop_event.is_set():
+                    now = time.monotonic()
+                    if now < next_deadline:
+                        time.sleep(next_deadline - now)
+                    next_deadline += period
+                    if next_deadline < time.monotonic():
+                        # Fell behind by more than a frame; skip ahead instead of bursting to catch up
+                        next_deadline = time.monotonic() + period
+
+                    # Grab raw BGRA pixels; the encoder reads them as BGRX, so no colour conversion is needed
+                    raw = grab(monitor)
+                    frame = np.frombuffer(raw.bgra, dtype=np.uint8).reshape(raw.height, raw.width, 4)
+
+                    # Freshness beats completeness: if the encoder is behind, drop the oldest raw frame
+                    try:
+                        raw_frames.put_nowait(frame)
+                    except queue.Full:
+                        try:
+                            raw_frames.get_nowait()
+                        except queue.Empty:
+                            pass
+                        raw_frames.put_nowait(frame)
+        except Exception as e:
+            self.status_signal.message.emit(f"Server capture error: {e}", 'error')
+            stop_event.set()
+
+    def _encode_frames(self, raw_frames, video_socket, stop_event):
+        """Pipeline stage 2: diffs and JPEG-encodes raw frames and sends them on video_socket."""
+        self._tune_encode_thread()
+        encode_jpeg = simplejpeg.encode_jpeg
+        # The last frame sent; None forces a full frame (new client or new frame size)
+        prev_frame = None
+        frame_id = 0
+        # Reusable buffers for the serialized frame and for one datagram; grown only if a frame doesn't fit
+        send_buf = bytearray(256 * 1024)
+        datagram = bytearray(VIDEO_DATAGRAM_STRUCT.size + VIDEO_DATAGRAM_PAYLOAD)
+        hello_buf = bytearray(VIDEO_HELLO_STRUCT.size + 1) # One byte spare, so longer datagrams don't match
+        last_send = 0.0
+        try:
+            while not stop_event.is_set():
+                self._receive_video_hellos(video_socket, hello_buf)
+                try:
+                    frame = raw_frames.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                video_address = self.video_address
+                if video_address is None:
+                    continue # The client hasn't sent its UDP port or a hello yet
+                screen_h, screen_w = frame.shape[:2]
+
+                if self.scale_factor < 1.0:
+                    frame = cv2.resize(frame, None, fx=self.scale_factor, fy=self.scale_factor, interpolation=cv2.INTER_AREA)
+
+                if self.keyframe_requested or (prev_frame is not None and frame.shape != prev_frame.shape):
+                    self.keyframe_requested = False
+                    prev_frame = None
+                rects = self._find_dirty_tiles(frame, prev_frame)
+                # Every frame is a fresh array (a new capture buffer or resize output), so keeping
+                # a reference is enough; nothing writes into it afterwards
+                prev_frame = frame
+                if not rects:
+                    # Screen unchanged; only a heartbeat now and then, so a lost last frame is noticed
+                    now = time.monotonic()
+                    if frame_id and now - last_send >= VIDEO_HEARTBEAT_INTERVAL:
+                        last_send = now
+                        VIDEO_DATAGRAM_STRUCT.pack_into(datagram, 0, frame_id - 1, 0, 0)
+                        try:
+                            video_socket.sendto(memoryview(datagram)[:VIDEO_DATAGRAM_STRUCT.size], video_address)
+                        except OSError:
+                            pass # The next one follows in a second
+                    continue
+
+                # JPEG is already entropy-coded; send it as-is. 4:2:0 chroma subsampling (simplejpeg defaults
+                # to 4:4:4) quarters the chroma planes the encoder has to transform and code.
+                quality = self.jpeg_quality
+                tiles = [(x, y, w, h, encode_jpeg(frame[y:y + h, x:x + w], quality=quality, colorspace='BGRX',
+                                                  colorsubsampling='420', fastdct=True))
+                         for x, y, w, h in rects]
+                size = TILE_COUNT_STRUCT.size + sum(TILE_HEADER_STRUCT.size + len(tile[4]) for tile in tiles)
+                if rects[0][2:] == (frame.shape[1], frame.shape[0]):
+                    # Adaptive quality logic. The targets are for full frames, so the small deltas of a mostly
+                    # still screen mustn't count, or they would push quality back up before the next full frame.
+                    self.last_frame_size = size
+                    if size > TARGET_MAX_FRAME_SIZE:
+                        if self.jpeg_quality <= 25:
+                            # Quality is near its floor; shed resolution instead
+                            self.scale_factor = max(0.5, self.scale_factor - 0.25)
+                        self.jpeg_quality = max(20, self.jpeg_quality - 5)
+                    elif size < TARGET_MIN_FRAME_SIZE:
+                        if self.jpeg_quality < 90:
+                            self.jpeg_quality = min(90, self.jpeg_quality + 5)
+                        elif self.scale_factor < 1.0:
+                            self.scale_factor = min(1.0, self.scale_factor + 0.25)
+
+                # Write native screen width/height then the tile payload into the reusable buffer
+                frame_len = FRAME_HEADER_STRUCT.size + size
+                if frame_len > len(send_buf):
+                    send_buf = bytearray(frame_len)
+                FRAME_HEADER_STRUCT.pack_into(send_buf, 0, screen_w, screen_h)
+                TILE_COUNT_STRUCT.pack_into(send_buf, FRAME_HEADER_STRUCT.size, frame.shape[1], frame.shape[0], len(tiles))
+                offset = FRAME_HEADER_STRUCT.size + TILE_COUNT_STRUCT.size
+                for x, y, w, h, jpeg in tiles:
+                    TILE_HEADER_STRUCT.pack_into(send_buf, offset, x, y, w, h, len(jpeg))
+                    offset += TILE_HEADER_STRUCT.size
+                    send_buf[offset:offset + len(jpeg)] = jpeg
+                    offset += len(jpeg)
+                try:
+                    self._send_frame_datagrams(video_socket, video_address, frame_id, memoryview(send_buf)[:frame_len], datagram)
+                except OSError:
+                    pass # A frame lost on the way is recovered by the client's keyframe request
+                frame_id += 1
+                last_send = time.monotonic()
+        except Exception as e:
+            self.status_signal.message.emit(f"Server encode error: {e}", 'error')
+            stop_event.set()
+
+    def _receive_video_hellos(self, video_socket, hello_buf):
+        """Points the stream at the source address of the client's queued hello datagrams.
+
+        The port the client reports over TCP only works when nothing between the peers filters or
+        rewrites it; its hellos open the way through any NAT or firewall and show where to send.
+        """
+        while select.select((video_socket,), (), (), 0)[0]:
+            try:
+                got, sender = video_socket.recvfrom_into(hello_buf)
+            except OSError:
+                return # Picked up again on the next call
+            if (self.video_token is not None and got == VIDEO_HELLO_STRUCT.size
+                    and VIDEO_HELLO_STRUCT.unpack_from(hello_buf)[0] == self.video_token
+                    and sender[0] == self.server_address[0] and sender != self.video_address):
+                # Anything sent to the old address may be lost, so start again with a full frame
+                self.keyframe_requested = True
+                self.video_address = sender
+
+    def _send_frame_datagrams(self, video_socket, address, frame_id, frame, datagram):
+        """Sends one serialized frame to address as VIDEO_DATAGRAM_PAYLOAD-sized fragments."""
+        header_size = VIDEO_DATAGRAM_STRUCT.size
+        datagram_view = memoryview(datagram)
+        frag_count = -(-len(frame) // VIDEO_DATAGRAM_PAYLOAD)
+        for frag_idx in range(frag_count):
+            chunk = frame[frag_idx * VIDEO_DATAGRAM_PAYLOAD:(frag_idx + 1) * VIDEO_DATAGRAM_PAYLOAD]
+            VIDEO_DATAGRAM_STRUCT.pack_into(datagram, 0, frame_id, frag_idx, frag_count)
+            datagram[header_size:header_size + len(chunk)] = chunk
+            video_socket.sendto(datagram_view[:header_size + len(chunk)], address)
+
+    def _tune_encode_thread(self):
+        """Keeps the calling encode thread off the GUI's cores and raises its priority where supported."""
+        # OpenCV's worker pool only adds scheduling jitter for one resize per frame (process-wide setting)
+        cv2.setNumThreads(1)
+        cpu_count = os.cpu_count() or 1
+        if cpu_count < 4:
+            return # Too few cores to reserve any for the GUI
+        try:
+            if hasattr(os, 'sched_setaffinity'):
+                # Leave cores 0-1 to the GUI thread
+                cpus = sorted(os.sched_getaffinity(0))
+                if len(cpus) >= 4:
+                    os.sched_setaffinity(threading.get_native_id(), set(cpus[2:]))
+            elif sys.platform == 'win32':
+                kernel32 = ctypes.windll.kernel32
+                thread = kernel32.GetCurrentThread()
+                mask = ((1 << min(cpu_count, 64)) - 1) & ~0b11 # Every core except 0-1
+                kernel32.SetThreadAffinityMask(thread, ctypes.c_size_t(mask))
+                kernel32.SetThreadPriority(thread, 1) # THREAD_PRIORITY_ABOVE_NORMAL
+        except OSError:
+            pass # Affinity/priority are best-effort tuning only
+
+    def _find_dirty_tiles(self, frame, prev_frame):
+        """Compares frame with prev_frame in TILE_SIZE tiles and returns the dirty rects.
+
+        Each rect is (x, y, w, h). Horizontal runs of dirty tiles are merged, and a run is
+        extended downwards while the rows below repeat it exactly, so a changed region goes out
+        as a few large JPEGs rather than one per tile, each with its own headers and tables.
+        The whole frame is returned as one rect when there is no previous frame or when most
+        tiles changed, since a single large JPEG then encodes more efficiently than many small ones.
+        """
+        h, w = frame.shape[:2]
+        if prev_frame is None:
+            return [(0, 0, w, h)]
+        # Vectorised compare of whole BGRX pixels, then OR-reduced per tile (reduceat handles the
+        # partial edge tiles). NumPy releases the GIL in these loops, unlike per-tile hashing in
+        # Python, so the GUI thread isn't held up while a frame is diffed.
+        changed_pixels = frame.view(np.uint32)[:, :, 0] != prev_frame.view(np.uint32)[:, :, 0]
+        changed_rows = np.logical_or.reduceat(changed_pixels, np.arange(0, h, TILE_SIZE), axis=0)
+        changed_tiles = np.logical_or.reduceat(changed_rows, np.arange(0, w, TILE_SIZE), axis=1)
+
+        if np.count_nonzero(changed_tiles) > FULL_FRAME_TILE_RATIO * changed_tiles.size:
+            return [(0, 0, w, h)]
+        # Run boundaries per tile row: +1 where a run starts, -1 just past where it ends
+        edges = np.diff(changed_tiles.astype(np.int8), axis=1, prepend=0, append=0)
+        rects = [] # [first tile col, first tile row, end tile col, end tile row]
+        open_runs = {} # (first col, end col) -> rect ending at the previous row
+        for ty, row_edges in enumerate(edges):
+            starts = np.flatnonzero(row_edges == 1).tolist()
+            if not starts and not open_runs:
+                continue
+            ends = np.flatnonzero(row_edges == -1).tolist()
+            runs = {}
+            for run in zip(starts, ends):
+                rect = open_runs.get(run)
+                if rect is None:
+                    rect = [run[0], ty, run[1], ty + 1]
+                    rects.append(rect)
+                else:
+                    rect[3] = ty + 1
+                runs[run] = rect
+            open_runs = runs
+        return [(tx0 * TILE_SIZE, ty0 * TILE_SIZE, min(tx1 * TILE_SIZE, w) - tx0 * TILE_SIZE, min(ty1 * TILE_SIZE, h) - ty0 * TILE_SIZE)
+                for tx0, ty0, tx1, ty1 in rects]
+
     def stop_server(self):
         if not self.is_server_running:
             self.status_signal.message.emit("Server is not running.", 'info')
@@ -527,81 +1074,55 @@ class DJRemoteDesktop(QWidget):
         
         self.is_server_running = False # Set flag to stop the server loop
         self.is_streaming = False # Ensure streaming also stops if active
+        if self.stream_stop_event:
+            self.stream_stop_event.set() # Stop the capture/encode pipeline stages
         self.status_signal.message.emit("Stopping server...", 'info')
         
-        # Attempt to close sockets to unblock threads
-        if self.server_connection:
-            try:
-                self.server_connection.shutdown(socket.SHUT_RDWR)
-                self.server_connection.close()
-            except OSError:
-                pass
-            self.server_connection = None
-        if self.server_socket:
-            try:
-                self.server_socket.shutdown(socket.SHUT_RDWR)
-                self.server_socket.close()
-            except OSError:
-                pass
-            self.server_socket = None
+        # Shut the sockets down to wake the server's event loop; it closes them itself,
+        # since closing a socket the loop is still watching would leave it waiting on a dead fd
+        for sock in (self.server_connection, self.server_socket):
+            if sock:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
         
-        # Wait for threads to finish (optional, but good for clean shutdown)
+        # Wait for the server thread to finish (optional, but good for clean shutdown)
         if self.screen_stream_thread and self.screen_stream_thread.is_alive():
             self.screen_stream_thread.join(timeout=2.0)
-        if self.input_handler_thread and self.input_handler_thread.is_alive():
-            self.input_handler_thread.join(timeout=2.0)
 
         self._update_button_states()
 
 
-    def handle_client_input(self, conn):
-        """Thread to listen for and process client input commands."""
+    async def handle_client_input(self, conn):
+        """Event loop task to listen for and process client input commands."""
+        # Commands are read in large chunks and every complete fixed-size record in the
+        # buffer is processed, so a burst of mouse moves costs one recv instead of one per
+        # command. Unprocessed bytes live in buf[start:end].
+        buf = bytearray(64 * 1024)
+        view = memoryview(buf)
+        start = end = 0
+        record_size = INPUT_EVENT_STRUCT.size
+        unpack_from = INPUT_EVENT_STRUCT.unpack_from
+        loop = asyncio.get_running_loop()
         try:
             while self.is_streaming and self.is_server_running:
-                # Read 4 bytes for command length
-                command_len_bytes = self._recv_all(conn, 4)
-                if not command_len_bytes:
-                    break # Connection closed
-                command_len = int.from_bytes(command_len_bytes, 'big')
-                
-                # Read the command data
-                command_data = self._recv_all(conn, command_len)
-                if not command_data:
+                if end == len(buf):
+                    # Move the trailing partial record to the front
+                    buf[:end - start] = buf[start:end]
+                    end -= start
+                    start = 0
+
+                got = await loop.sock_recv_into(conn, view[end:])
+                if not got:
                     break # Connection closed
+                end += got
 
-                # Deserialize and execute command
-                try:
-                    cmd_parts = command_data.decode('utf-8').split('|')
-                    cmd_type = cmd_parts[0]
-                    
-                    if cmd_type == "MOUSE_MOVE" and len(cmd_parts) == 3:
-                        x, y = int(cmd_parts[1]), int(cmd_parts[2])
-                        pyautogui.moveTo(x, y, duration=0)
-                    elif cmd_type == "MOUSE_CLICK" and len(cmd_parts) == 4:
-                        button, x, y = cmd_parts[1], int(cmd_parts[2]), int(cmd_parts[3])
-                        pyautogui.click(x=x, y=y, button=button)
-                    elif cmd_type == "MOUSE_DOWN" and len(cmd_parts) == 4:
-                        button, x, y = cmd_parts[1], int(cmd_parts[2]), int(cmd_parts[3])
-                        pyautogui.mouseDown(x=x, y=y, button=button)
-                    elif cmd_type == "MOUSE_UP" and len(cmd_parts) == 4:
-                        button, x, y = cmd_parts[1], int(cmd_parts[2]), int(cmd_parts[3])
-                        pyautogui.mouseUp(x=x, y=y, button=button)
-                    elif cmd_type == "MOUSE_SCROLL" and len(cmd_parts) == 2:
-                        clicks = int(cmd_parts[1])
-                        pyautogui.scroll(clicks)
-                    elif cmd_type == "KEY_DOWN" and len(cmd_parts) == 2:
-                        key = cmd_parts[1]
-                        pyautogui.keyDown(key)
-                    elif cmd_type == "KEY_UP" and len(cmd_parts) == 2:
-                        key = cmd_parts[1]
-                        pyautogui.keyUp(key)
-                    # Add more commands as needed (e.g., drag, hotkeys)
-                except IndexError:
-                    self.status_signal.message.emit("Server: Received malformed command.", 'error')
-                except ValueError:
-                    self.status_signal.message.emit("Server: Received invalid command data.", 'error')
-                except Exception as cmd_e:
-                    self.status_signal.message.emit(f"Server: Error processing command: {cmd_e}", 'error')
+                while end - start >= record_size:
+                    self._execute_command(*unpack_from(buf, start))
+                    start += record_size
+                if start == end:
+                    start = end = 0
 
         except (socket.error, ConnectionResetError) as e:
             self.status_signal.message.emit(f"Server input handler connection error: {e}", 'error')
@@ -611,15 +1132,28 @@ class DJRemoteDesktop(QWidget):
             self.status_signal.message.emit("Client input handler stopped.", 'info')
             self.is_streaming = False # Ensure streaming also stops if input fails
 
-    def _recv_all(self, sock, n):
-        """Helper function to ensure all bytes are received from a socket."""
-        data = b''
-        while len(data) < n:
-            packet = sock.recv(n - len(data))
-            if not packet:
-                return None # Connection closed or error
-            data += packet
-        return data
+    def _execute_command(self, op, button, key_id, x, y):
+        """Executes a single client input command record."""
+        if op == OP_REQUEST_KEYFRAME:
+            self.keyframe_requested = True # Picked up by the encode thread
+            return
+        if op == OP_VIDEO_PORT:
+            if not 0 < x < 65536:
+                self._emit_status_throttled("Server: Received invalid command data.", 'error')
+                return
+            # Start streaming to the client's UDP port with a full frame, until a hello says otherwise
+            self.video_token = y
+            self.keyframe_requested = True
+            self.video_address = (self.server_address[0], x)
+            return
+        try:
+            COMMAND_HANDLERS[op](button, key_id, x, y)
+        except (IndexError, KeyError):
+            self._emit_status_throttled("Server: Received malformed command.", 'error')
+        except ValueError:
+            self._emit_status_throttled("Server: Received invalid command data.", 'error')
+        except Exception as cmd_e:
+            self._emit_status_throttled(f"Server: Error processing command: {cmd_e}", 'error')
 
     def start_client(self):
         if self.is_client_connected:
@@ -636,20 +1170,35 @@ class DJRemoteDesktop(QWidget):
 
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Send input events immediately
             self.client_socket.connect((server_ip, 9999))
+            # Frames arrive on a UDP socket whose port is sent to the server over the TCP connection.
+            # Non-blocking, so the receive thread can drain every queued datagram after one select.
+            self.video_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.video_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20) # 4MB, holds several full frames
+            if hasattr(socket, 'SIO_UDP_CONNRESET'):
+                # Windows: a hello sent before the server's UDP port is open mustn't fail later reads
+                self.video_socket.ioctl(socket.SIO_UDP_CONNRESET, False)
+            self.video_socket.bind(('0.0.0.0', 0))
+            self.video_socket.setblocking(False)
+            self.video_token = int.from_bytes(os.urandom(4), 'big') >> 1 # Fits the record's signed y field
             self.is_client_connected = True
             self.is_streaming = True # Client is now actively receiving stream
+            self.frame_buffers = None # Don't show a frame left over from a previous session
+            self.stale_tiles = []
+            self.unshown_tiles = []
+            self.decode_frame_size = None # The server starts every connection with a full frame
+            self.frame_consumed.set()
+            # Sent directly rather than through send_input_events, so a failure lands in the handlers below
+            self.client_socket.sendall(INPUT_EVENT_STRUCT.pack(OP_VIDEO_PORT, 0, 0, self.video_socket.getsockname()[1], self.video_token))
             self._update_button_states()
             self.status_signal.message.emit("Connected to server. Streaming...", 'success')
-            self.image_label.setText("") # Clear "Waiting for connection" text
+            self._set_streaming_view(True)
 
             # Start a separate thread for receiving frames
             self.client_receive_thread = threading.Thread(target=self._client_receive_loop, daemon=True)
             self.client_receive_thread.start()
 
-            # Start a QTimer to update the UI with the latest frame from the buffer
-            self.client_ui_update_timer.start(30) # Update UI approx 30 FPS
-
         except ConnectionRefusedError:
             self.status_signal.message.emit(f"Connection refused to {server_ip}:9999. Is the server running?", 'error')
             self.stop_client_session()
@@ -664,127 +1213,262 @@ class DJRemoteDesktop(QWidget):
             self.stop_client_session()
 
     def _client_receive_loop(self):
-        """Thread to continuously receive frames from the server."""
+        """Thread to receive video datagrams, reassemble them into frames and present the newest.
+
+        stop_client_session doesn't wait for this thread to exit, so it can outlive its session
+        briefly. The session is this thread's only while self.client_socket is still its control
+        socket, and it leaves the frame buffers and session state alone once a new one has started.
+        """
+        video_socket = self.video_socket
+        control_socket = self.client_socket
+        server_ip = control_socket.getpeername()[0] # Datagrams from anyone else are ignored
+        view = self.rx_view
+        header_size = VIDEO_DATAGRAM_STRUCT.size
+        unpack_from = VIDEO_DATAGRAM_STRUCT.unpack_from
+        slots = [FrameAssembly() for _ in range(VIDEO_REASSEMBLY_SLOTS)]
+        newest_id = -1 # Highest frame id a datagram has arrived for
+        applied_id = -1 # Id of the last frame decoded into the back buffer
+        frame_waiting = False # The back buffer holds a frame the UI hasn't been handed yet
+        last_keyframe_request = 0.0
+        hello = VIDEO_HELLO_STRUCT.pack(self.video_token)
+        last_hello = 0.0
+        started = time.monotonic()
         try:
-            while self.is_client_connected and self.is_streaming:
-                # Read 8 bytes for frame size
-                size_bytes = self._recv_all(self.client_socket, 8)
-                if not size_bytes:
-                    self.status_signal.message.emit("Server disconnected while receiving frame size.", 'error')
-                    break # Connection closed
-                size = int.from_bytes(size_bytes, 'big')
+            while self.is_client_connected and self.is_streaming and self.client_socket is control_socket:
+                now = time.monotonic()
+                if now - last_hello >= VIDEO_HELLO_INTERVAL:
+                    last_hello = now
+                    try:
+                        video_socket.sendto(hello, (server_ip, 9999))
+                    except OSError:
+                        pass # The next hello is only a second away
+                if applied_id < 0 and started is not None and now - started >= VIDEO_START_TIMEOUT:
+                    started = None # Reported once per session
+                    self.status_signal.message.emit("No video from the server. Check that no firewall blocks UDP port 9999.", 'error')
+                # While a frame waits for the UI, poll briefly so it goes out soon after the UI is free
+                readable, _, _ = select.select((video_socket, control_socket), (), (), 0.005 if frame_waiting else 0.5)
+                if control_socket in readable and not control_socket.recv(1):
+                    # The server never writes to the control connection, so readable means it closed
+                    if self.client_socket is control_socket: # Otherwise the session was stopped locally
+                        self.status_signal.message.emit("Server disconnected.", 'error')
+                    break
 
-                data = self._recv_all(self.client_socket, size)
-                if not data:
-                    self.status_signal.message.emit("Server disconnected while receiving frame data.", 'error')
-                    break # Connection closed
-                
-                # Store the latest frame data in a thread-safe manner
-                with self.latest_frame_lock:
-                    self.latest_frame_data = data
+                while video_socket in readable and self.client_socket is control_socket:
+                    try:
+                        got, sender = video_socket.recvfrom_into(view)
+                    except (BlockingIOError, InterruptedError):
+                        break # Drained
+                    if got < header_size or sender[0] != server_ip:
+                        continue
+                    frame_id, frag_idx, frag_count = unpack_from(view)
+                    if not frag_count:
+                        # Heartbeat: the server's last frame never got here, and no later one will show it
+                        if frame_id > applied_id:
+                            last_keyframe_request = time.monotonic()
+                            self.status_signal.keyframe_needed.emit()
+                        continue
+                    # Late datagrams are dropped: for a frame already superseded on screen, or one that
+                    # is still incomplete by the time a frame two ids newer has started arriving
+                    if frame_id <= applied_id or frame_id <= newest_id - 2:
+                        continue
+                    newest_id = max(newest_id, frame_id)
+                    slot = slots[frame_id % VIDEO_REASSEMBLY_SLOTS]
+                    if slot.frame_id != frame_id:
+                        if not 0 < frag_count <= MAX_FRAME_FRAGMENTS:
+                            self._emit_status_throttled("Dropped an oversized or empty frame.", 'error')
+                            continue
+                        slot.reset(frame_id, frag_count)
+                    elif frag_count != slot.frag_count:
+                        continue # Doesn't belong to the frame being collected
+                    if not slot.add(frag_idx, view[header_size:got]):
+                        continue
+
+                    if frame_id != applied_id + 1:
+                        # Frames were lost, so the delta tiles on screen are out of date until a full frame arrives
+                        now = time.monotonic()
+                        if now - last_keyframe_request >= KEYFRAME_REQUEST_INTERVAL:
+                            last_keyframe_request = now
+                            self.status_signal.keyframe_needed.emit()
+                    applied_id = frame_id
+                    if not self._apply_frame(memoryview(slot.data)[:slot.size]):
+                        continue
+                    frame_waiting = True
+                    # The UI only ever gets the newest frame: if it is still busy with the last one,
+                    # later frames are patched into the same back buffer and it gets them all at once
+                    if self.frame_consumed.is_set():
+                        self._hand_over_frame()
+                        frame_waiting = False
+
+                if frame_waiting and self.frame_consumed.is_set() and self.client_socket is control_socket:
+                    self._hand_over_frame()
+                    frame_waiting = False
         except (socket.error, ConnectionResetError) as ce:
-            self.status_signal.message.emit(f"Client receive error: {ce}", 'error')
+            if self.client_socket is control_socket: # Otherwise the session was stopped locally
+                self.status_signal.message.emit(f"Client receive error: {ce}", 'error')
         except Exception as e:
             self.status_signal.message.emit(f"General client receive loop error: {e}", 'error')
         finally:
-            self.is_streaming = False # Stop streaming flag
+            video_socket.close()
             self.status_signal.message.emit("Client receive loop stopped.", 'info')
-            self.stop_client_session() # Ensure full session cleanup
-
-    def _update_image_label_from_buffer(self):
-        """Updates the QLabel with the latest frame from the buffer."""
+            if self.client_socket is control_socket:
+                self.is_streaming = False # Stop streaming flag
+                self.status_signal.session_ended.emit() # Ensure full session cleanup; it closes the control socket
+            else:
+                control_socket.close() # The session was already stopped and left the socket to this thread
+
+    def _apply_frame(self, data):
+        """Decodes a reassembled frame's tiles into the back buffer. Returns False for a malformed frame."""
+        decode_jpeg = simplejpeg.decode_jpeg
+        offset = FRAME_HEADER_STRUCT.size + TILE_COUNT_STRUCT.size
+        if len(data) < offset + TILE_HEADER_STRUCT.size:
+            self._emit_status_throttled("Dropped a malformed frame.", 'error')
+            return False
+        screen_w, screen_h = FRAME_HEADER_STRUCT.unpack_from(data, 0)
+        frame_w, frame_h, num_tiles = TILE_COUNT_STRUCT.unpack_from(data, FRAME_HEADER_STRUCT.size)
+        # The server only ever scales frames down from its screen, so anything else is corrupt; the
+        # sizes are checked before they size the frame buffers
+        if not (0 < frame_w <= screen_w and 0 < frame_h <= screen_h and screen_w * screen_h <= MAX_FRAME_PIXELS and num_tiles):
+            self._emit_status_throttled("Dropped a malformed frame.", 'error')
+            return False
+        if self.remote_screen_size != (screen_w, screen_h):
+            self.remote_screen_size = (screen_w, screen_h)
+            self.mouse_transform = None
+
+        full_frame = num_tiles == 1 and TILE_HEADER_STRUCT.unpack_from(data, offset)[2:4] == (frame_w, frame_h)
+        if full_frame:
+            # The buffers start over on a full frame, so this is where the decode scale may change
+            self.decode_scale_divisor = self._pick_decode_scale_divisor(frame_w, frame_h)
+            self.decode_frame_size = (frame_w, frame_h)
+            self.requested_scale_divisor = None
+        scale_divisor = self.decode_scale_divisor
+        # Sizes round up, so an edge tile's scaled end still lands on the scaled frame edge
+        out_w = -(-frame_w // scale_divisor)
+        out_h = -(-frame_h // scale_divisor)
+
+        if self.frame_buffers is None or self.frame_buffers[0].shape[:2] != (out_h, out_w):
+            # The server always follows a frame size change with a full frame
+            self.frame_buffers = [np.zeros((out_h, out_w, 4), dtype=np.uint8) for _ in range(2)]
+            self.stale_tiles = []
+            self.unshown_tiles = []
+        back_buffer = self.frame_buffers[self.back_buffer_index]
+        # A full frame is decoded straight into the back buffer rather than into a new array
+        # that would then be copied over it
+        decode_buffer = back_buffer if full_frame else None
+
+        tiles = []
+        bad_tiles = 0
+        for _ in range(num_tiles):
+            if offset + TILE_HEADER_STRUCT.size > len(data):
+                bad_tiles += 1 # Truncated tile list
+                break
+            x, y, w, h, jpeg_len = TILE_HEADER_STRUCT.unpack_from(data, offset)
+            offset += TILE_HEADER_STRUCT.size
+            tile_w = -(-w // scale_divisor)
+            tile_h = -(-h // scale_divisor)
+            tile = None
+            if x + w <= frame_w and y + h <= frame_h and offset + jpeg_len <= len(data):
+                try:
+                    # libjpeg-turbo writes the texture's RGBX layout directly during decode, so no colour
+                    # conversion or padding pass is needed, and scales in its IDCT when the view is smaller
+                    tile = decode_jpeg(data[offset:offset + jpeg_len], colorspace='RGBX', min_height=tile_h, min_width=tile_w,
+                                       buffer=decode_buffer)
+                except ValueError:
+                    pass
+            offset += jpeg_len
+            if tile is None or tile.shape[:2] != (tile_h, tile_w):
+                bad_tiles += 1
+                continue
+            tiles.append((x // scale_divisor, y // scale_divisor, tile_w, tile_h, tile))
+        if bad_tiles:
+            # One message per frame at most, not one per tile
+            self._emit_status_throttled("Could not decode image frame. Corrupted data?", 'error')
+
+        if full_frame:
+            if bad_tiles:
+                # The failed decode may have half overwritten the back buffer, so only a new full frame can fix it
+                self.status_signal.keyframe_needed.emit()
+                return False
+            # Already in place; the other buffer will copy it from this one when it catches up
+            self.stale_tiles = []
+            self.unshown_tiles = [(0, 0, out_w, out_h, back_buffer)]
+            return True
+        # Catch the back buffer up with the frames it missed first
+        for x, y, w, h, tile in self.stale_tiles:
+            back_buffer[y:y + h, x:x + w] = tile
+        self.stale_tiles = []
+        for x, y, w, h, tile in tiles:
+            back_buffer[y:y + h, x:x + w] = tile
+        self.unshown_tiles.extend(tiles)
+        return True
+
+    def _hand_over_frame(self):
+        """Hands the back buffer to the UI thread; the other buffer becomes the back buffer.
+
+        Only called once frame_consumed is set, i.e. the UI has finished with the buffer handed over before.
+        """
+        self.frame_consumed.clear()
+        self.status_signal.frame_ready.emit(self.frame_buffers[self.back_buffer_index])
+        self.back_buffer_index ^= 1
+        # The new back buffer has missed every frame patched into the one just handed over
+        self.stale_tiles = self.unshown_tiles
+        self.unshown_tiles = []
+
+    def _show_frame(self, frame):
+        """Displays a frame buffer handed over by the receive thread."""
         if not self.is_client_connected:
+            self.frame_consumed.set()
             return
+        frame_size = self.frame_view.frame_size
+        try:
+            # The upload copies the pixels to the GPU, after which the receive thread may reuse frame's buffer
+            self.frame_view.upload_frame(frame)
+        except Exception as e:
+            self.status_signal.message.emit(f"Error processing/displaying frame: {e}", 'error')
+            self.stop_client_session()
+        finally:
+            self.frame_consumed.set()
+        if self.frame_view.frame_size != frame_size:
+            self.mouse_transform = None
 
-        frame_data = None
-        with self.latest_frame_lock:
-            if self.latest_frame_data:
-                frame_data = self.latest_frame_data
-                self.latest_frame_data = None # Clear buffer after use
-
-        if frame_data:
-            try:
-                frame = zlib.decompress(frame_data)
-                frame = cv2.imdecode(np.frombuffer(frame, np.uint8), cv2.IMREAD_COLOR)
-                
-                if frame is None:
-                    self.status_signal.message.emit("Could not decode image frame. Corrupted data?", 'error')
-                    return
-
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                h, w, ch = frame.shape
-                bytes_per_line = ch * w
-                qimg = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-                
-                # Scale pixmap to fit the image_label, maintaining aspect ratio
-                pixmap = QPixmap.fromImage(qimg)
-                scaled_pixmap = pixmap.scaled(self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                
-                self.image_label.setPixmap(scaled_pixmap)
-            except Exception as e:
-                self.status_signal.message.emit(f"Error processing/displaying frame: {e}", 'error')
-                self.stop_client_session()
-
-
-    def send_input_events(self, event_type, *args):
+    def send_input_events(self, op, *args):
         if not self.client_socket or not self.is_client_connected:
             return
+        if op != OP_MOUSE_MOVE and self.pending_mouse_move is not None:
+            self._flush_mouse_move() # Keep event order: the coalesced move goes out before this event
 
         try:
-            command = f"{event_type}"
-            if event_type.startswith("MOUSE"):
-                # Get the currently displayed pixmap and its original dimensions
-                current_pixmap = self.image_label.pixmap()
-                if current_pixmap is None:
-                    # Cannot scale if no image is displayed yet
-                    return 
-
-                # Get the original dimensions of the image that was sent from the server
-                # This is crucial for accurate coordinate mapping.
-                # If the server sends a 1920x1080 image, and client displays it scaled,
-                # mouse events need to be mapped back to 1920x1080.
-                # For simplicity, we assume the original image size is what was captured by pyautogui.screenshot()
-                # A more robust solution would be for the server to send its screen resolution on connection.
-                # For now, we'll use the pixmap's original size as the target resolution.
-                original_width = current_pixmap.width()
-                original_height = current_pixmap.height()
-                
-                # Get the actual rectangle where the pixmap is drawn within the QLabel
-                # This accounts for Qt.KeepAspectRatio and potential black bars
-                label_rect = self.image_label.contentsRect()
-                pixmap_scaled_size = current_pixmap.size().scaled(label_rect.size(), Qt.KeepAspectRatio)
-
-                offset_x = (label_rect.width() - pixmap_scaled_size.width()) / 2
-                offset_y = (label_rect.height() - pixmap_scaled_size.height()) / 2
-
-                # Calculate scaling factors from displayed scaled image to original image
-                scale_x = original_width / pixmap_scaled_size.width()
-                scale_y = original_height / pixmap_scaled_size.height()
-
-                if event_type == "MOUSE_MOVE" or event_type == "MOUSE_DOWN" or event_type == "MOUSE_UP":
+            if op <= OP_MOUSE_SCROLL:
+                transform = self.mouse_transform
+                if transform is None:
+                    transform = self.mouse_transform = self._compute_mouse_transform()
+                    if transform is None:
+                        # Cannot scale if no image is displayed yet
+                        return
+                offset_x, offset_y, scale_x, scale_y, max_x, max_y = transform
+
+                if op == OP_MOUSE_SCROLL:
+                    record = INPUT_EVENT_STRUCT.pack(op, 0, 0, args[0], 0) # clicks
+                else:
                     x_label, y_label = args[0], args[1]
                     
-                    # Convert QLabel coordinates to original pixmap coordinates
+                    # Convert frame_view coordinates to server screen coordinates
                     x_original = int((x_label - offset_x) * scale_x)
                     y_original = int((y_label - offset_y) * scale_y)
 
                     # Clamp coordinates to ensure they are within the original image bounds
-                    x_original = max(0, min(x_original, original_width - 1))
-                    y_original = max(0, min(y_original, original_height - 1))
-
-                    command += f"|{x_original}|{y_original}"
-                    if len(args) > 2: # For mouse clicks/down/up, button is also passed
-                        command += f"|{args[2]}" # button
-                elif event_type == "MOUSE_SCROLL":
-                    command += f"|{args[0]}" # clicks
-            elif event_type.startswith("KEY"):
-                command += f"|{args[0]}" # key
-            
-            command_bytes = command.encode('utf-8')
-            command_len = len(command_bytes)
+                    x_original = max(0, min(x_original, max_x))
+                    y_original = max(0, min(y_original, max_y))
+
+                    # For mouse clicks/down/up, button id is also passed
+                    button = args[2] if op != OP_MOUSE_MOVE else 0
+                    record = INPUT_EVENT_STRUCT.pack(op, button, 0, x_original, y_original)
+            elif op == OP_REQUEST_KEYFRAME:
+                record = INPUT_EVENT_STRUCT.pack(op, 0, 0, 0, 0)
+            else:
+                record = INPUT_EVENT_STRUCT.pack(op, 0, KEY_IDS[args[0]], 0, 0) # key
             
-            # Send length first (4 bytes), then data
-            self.client_socket.sendall(command_len.to_bytes(4, 'big') + command_bytes)
+            # Records are fixed-size, so they go out as-is with no length prefix
+            self.client_socket.sendall(record)
 
         except (socket.error, ConnectionResetError) as e:
             self.status_signal.message.emit(f"Error sending input event: {e}. Disconnecting client.", 'error')
@@ -793,34 +1477,101 @@ class DJRemoteDesktop(QWidget):
             # print(f"Warning: Error in send_input_events: {e}") # For debugging, can be noisy
             pass # Suppress minor errors, as frequent input events might generate them
 
-    # Event filter to capture mouse events on image_label
+    def _compute_mouse_transform(self):
+        """Returns (offset_x, offset_y, scale_x, scale_y, max_x, max_y) mapping frame_view to server coordinates."""
+        if self.frame_view.frame_size is None or self.remote_screen_size is None:
+            return None
+
+        # Mouse events must be mapped back to the server's native screen resolution.
+        # The server sends it with every frame, since the frame itself may have been
+        # downscaled by its adaptive resolution ladder.
+        original_width, original_height = self.remote_screen_size
+
+        # Get the actual rectangle where the frame is drawn within the view
+        # This accounts for Qt.KeepAspectRatio and potential black bars
+        frame_rect = self.frame_view.frame_rect()
+
+        # Calculate scaling factors from displayed scaled image to original image
+        scale_x = original_width / frame_rect.width()
+        scale_y = original_height / frame_rect.height()
+        return frame_rect.x(), frame_rect.y(), scale_x, scale_y, original_width - 1, original_height - 1
+
+    def _pick_decode_scale_divisor(self, frame_w, frame_h):
+        """Returns the largest decode divisor whose output still covers frame_view's fitted size."""
+        view_size = self.view_size
+        if view_size is None:
+            return 1
+        # Frames are shown scaled by this factor to fit the label (KeepAspectRatio)
+        fit = min(view_size[0] / frame_w, view_size[1] / frame_h)
+        for divisor in DECODE_SCALE_DIVISORS:
+            if divisor * fit <= 1:
+                return divisor
+        return 1
+
+    def _check_decode_scale(self):
+        """Requests a full frame when frame_view's size calls for a different decode scale."""
+        if not self.is_client_connected or self.decode_frame_size is None:
+            return
+        divisor = self._pick_decode_scale_divisor(*self.decode_frame_size)
+        if divisor != self.decode_scale_divisor and divisor != self.requested_scale_divisor:
+            self.requested_scale_divisor = divisor # Don't repeat the request for every resize step
+            self.send_input_events(OP_REQUEST_KEYFRAME)
+
+    def _request_keyframe(self):
+        """Asks the server for a full frame after the receive thread lost one."""
+        self.send_input_events(OP_REQUEST_KEYFRAME)
+
+    # Event filter to capture mouse events on frame_view
     def eventFilter(self, obj, event):
-        if obj == self.image_label and self.is_client_connected:
+        if obj == self.frame_view and event.type() in VIEW_SIZE_EVENTS:
+            self.mouse_transform = None # The letterboxing changes with the label size
+            # Frames are drawn at device resolution, so on a HiDPI screen they must decode that large
+            ratio = self.frame_view.devicePixelRatioF()
+            self.view_size = (self.frame_view.width() * ratio, self.frame_view.height() * ratio)
+            self._check_decode_scale()
+        if obj == self.frame_view and self.is_client_connected:
             if event.type() == QEvent.MouseButtonPress:
-                self.send_input_events("MOUSE_DOWN", event.position().x(), event.position().y(), self._map_qt_button(event.button()))
+                self.send_input_events(OP_MOUSE_DOWN, event.position().x(), event.position().y(), self._map_qt_button(event.button()))
                 return True
             elif event.type() == QEvent.MouseButtonRelease:
-                self.send_input_events("MOUSE_UP", event.position().x(), event.position().y(), self._map_qt_button(event.button()))
+                self.send_input_events(OP_MOUSE_UP, event.position().x(), event.position().y(), self._map_qt_button(event.button()))
                 return True
             elif event.type() == QEvent.MouseMove:
-                # Send mouse move events for both simple moves and drags
-                self.send_input_events("MOUSE_MOVE", event.position().x(), event.position().y())
+                # Send mouse move events for both simple moves and drags, coalesced to one per interval
+                self._queue_mouse_move(event.position().x(), event.position().y())
                 return True
             elif event.type() == QEvent.Wheel:
                 degrees = event.angleDelta().y() / 8 # Standard Qt wheel delta is 8*degrees
                 # PyAutoGUI scroll units are usually 15 degrees per "click"
-                self.send_input_events("MOUSE_SCROLL", int(degrees / 15))
+                self.send_input_events(OP_MOUSE_SCROLL, int(degrees / 15))
                 return True
         return super().eventFilter(obj, event)
 
+    def _queue_mouse_move(self, x, y):
+        if self.mouse_move_timer.isActive():
+            self.pending_mouse_move = (x, y) # Replaces any older pending move
+        else:
+            self.send_input_events(OP_MOUSE_MOVE, x, y)
+            self.mouse_move_timer.start(MOUSE_MOVE_INTERVAL_MS)
+
+    def _flush_mouse_move(self):
+        """Sends the latest coalesced mouse move, if any."""
+        if self.pending_mouse_move is None:
+            return
+        x, y = self.pending_mouse_move
+        self.pending_mouse_move = None
+        self.send_input_events(OP_MOUSE_MOVE, x, y)
+        self.mouse_move_timer.start(MOUSE_MOVE_INTERVAL_MS) # Keep throttling while the mouse is moving
+
     def _map_qt_button(self, qt_button):
+        # Returns the button id used on the wire (an index into MOUSE_BUTTONS)
         if qt_button == Qt.LeftButton:
-            return "left"
+            return 0
         elif qt_button == Qt.RightButton:
-            return "right"
+            return 1
         elif qt_button == Qt.MiddleButton:
-            return "middle"
-        return "left" # Default or raise error for unhandled
+            return 2
+        return 0 # Default or raise error for unhandled
 
     # Override key event handlers for the main window (client mode)
     def keyPressEvent(self, event: QKeyEvent):
@@ -829,7 +1580,7 @@ class DJRemoteDesktop(QWidget):
             if not event.isAutoRepeat():
                 key_name = self._map_qt_key_to_pyautogui(event.key())
                 if key_name:
-                    self.send_input_events("KEY_DOWN", key_name)
+                    self.send_input_events(OP_KEY_DOWN, key_name)
         super().keyPressEvent(event)
 
     def keyReleaseEvent(self, event: QKeyEvent):
@@ -837,79 +1588,59 @@ class DJRemoteDesktop(QWidget):
             if not event.isAutoRepeat():
                 key_name = self._map_qt_key_to_pyautogui(event.key())
                 if key_name:
-                    self.send_input_events("KEY_UP", key_name)
+                    self.send_input_events(OP_KEY_UP, key_name)
         super().keyReleaseEvent(event)
 
     def _map_qt_key_to_pyautogui(self, qt_key):
-        # Comprehensive mapping of Qt keys to PyAutoGUI key names
-        # This list can be expanded as needed for more special keys
-        key_map = {
-            Qt.Key_Return: 'enter', Qt.Key_Enter: 'enter', Qt.Key_Space: 'space',
-            Qt.Key_Backspace: 'backspace', Qt.Key_Tab: 'tab', Qt.Key_Escape: 'esc',
-            Qt.Key_Up: 'up', Qt.Key_Down: 'down', Qt.Key_Left: 'left', Qt.Key_Right: 'right',
-            Qt.Key_Shift: 'shift', Qt.Key_Control: 'ctrl', Qt.Key_Alt: 'alt',
-            Qt.Key_Meta: 'win', # Windows key
-            Qt.Key_CapsLock: 'capslock', Qt.Key_NumLock: 'numlock', Qt.Key_ScrollLock: 'scrolllock',
-            Qt.Key_Insert: 'insert', Qt.Key_Delete: 'delete', Qt.Key_Home: 'home',
-            Qt.Key_End: 'end', Qt.Key_PageUp: 'pageup', Qt.Key_PageDown: 'pagedown',
-            Qt.Key_F1: 'f1', Qt.Key_F2: 'f2', Qt.Key_F3: 'f3', Qt.Key_F4: 'f4',
-            Qt.Key_F5: 'f5', Qt.Key_F6: 'f6', Qt.Key_F7: 'f7', Qt.Key_F8: 'f8',
-            Qt.Key_F9: 'f9', Qt.Key_F10: 'f10', Qt.Key_F11: 'f11', Qt.Key_F12: 'f12',
-            Qt.Key_Print: 'printscreen', Qt.Key_Pause: 'pause', Qt.Key_Menu: 'apps', # Context menu key
-            Qt.Key_Period: '.', Qt.Key_Comma: ',', Qt.Key_Slash: '/',
-            Qt.Key_Backslash: '\\', Qt.Key_Minus: '-', Qt.Key_Equal: '=',
-            Qt.Key_BracketLeft: '[', Qt.Key_BracketRight: ']', Qt.Key_Semicolon: ';',
-            Qt.Key_Apostrophe: "'", Qt.Key_Grave: '`', # Backtick
-            Qt.Key_QuoteDbl: '"', Qt.Key_Plus: '+', Qt.Key_Underscore: '_',
-            Qt.Key_Asterisk: '*', Qt.Key_Ampersand: '&', Qt.Key_ParenLeft: '(',
-            Qt.Key_ParenRight: ')', Qt.Key_Exclam: '!', Qt.Key_At: '@',
-            Qt.Key_NumberSign: '#', Qt.Key_Dollar: '$', Qt.Key_Percent: '%',
-            Qt.Key_Caret: '^', Qt.Key_Colon: ':', Qt.Key_Less: '<',
-            Qt.Key_Greater: '>', Qt.Key_Question: '?', Qt.Key_Bar: '|',
-            Qt.Key_Tilde: '~', Qt.Key_BraceLeft: '{', Qt.Key_BraceRight: '}',
-            # Numpad keys
-            Qt.Key_Numpad0: 'num0', Qt.Key_Numpad1: 'num1', Qt.Key_Numpad2: 'num2',
-            Qt.Key_Numpad3: 'num3', Qt.Key_Numpad4: 'num4', Qt.Key_Numpad5: 'num5',
-            Qt.Key_Numpad6: 'num6', Qt.Key_Numpad7: 'num7', Qt.Key_Numpad8: 'num8',
-            Qt.Key_Numpad9: 'num9', Qt.Key_NumpadAdd: 'numadd', Qt.Key_NumpadSubtract: 'numsubtract',
-            Qt.Key_NumpadMultiply: 'nummultiply', Qt.Key_NumpadDivide: 'numdivide',
-            Qt.Key_NumpadDecimal: 'numdecimal', Qt.Key_NumpadEnter: 'enter', # Numpad enter is just 'enter'
-        }
-        
         # Handle digits and letters directly as they map simply
         if Qt.Key_0 <= qt_key <= Qt.Key_9:
             return chr(qt_key)
         if Qt.Key_A <= qt_key <= Qt.Key_Z:
             return chr(qt_key).lower() # PyAutoGUI uses lowercase for letters
 
-        return key_map.get(qt_key, None) # Return None if not mapped
+        return QT_KEY_NAMES.get(qt_key) # None if not mapped
 
     def stop_client_session(self):
         if not self.is_client_connected:
             return
 
-        self.client_ui_update_timer.stop() # Stop UI update timer
+        self.mouse_move_timer.stop()
+        self.pending_mouse_move = None
         self.is_client_connected = False
         self.is_streaming = False # Stop client receiving loop
 
-        if self.client_socket:
+        control_socket, self.client_socket = self.client_socket, None
+        if control_socket:
             try:
-                # Attempt graceful shutdown before closing
-                self.client_socket.shutdown(socket.SHUT_RDWR)
-                self.client_socket.close()
+                # Makes the control socket readable, which wakes the receive thread's select at once
+                control_socket.shutdown(socket.SHUT_RDWR)
             except OSError as e:
                 self.status_signal.message.emit(f"Error closing client socket: {e}", 'error')
-            self.client_socket = None
-        
-        # Wait for client receive thread to finish
-        if self.client_receive_thread and self.client_receive_thread.is_alive():
-            self.client_receive_thread.join(timeout=2.0)
 
-        self.image_label.clear() # Clear existing image
+        # Never waits long on the UI thread: the receive thread only blocks in a select of at most 0.5s.
+        # If it is still running it closes the sockets itself on the way out, since closing them under
+        # its select isn't reliable on every platform.
+        receive_thread = self.client_receive_thread
+        if receive_thread and receive_thread.is_alive():
+            receive_thread.join(timeout=0.1)
+        if not (receive_thread and receive_thread.is_alive()):
+            if control_socket:
+                control_socket.close()
+            if self.video_socket:
+                self.video_socket.close()
+
+        self._set_streaming_view(False)
         self.image_label.setText("Connection lost or stream ended. Please reconnect.")
         self.status_signal.message.emit("Client session ended.", 'info')
         self._update_button_states()
 
+    def _set_streaming_view(self, streaming):
+        """Swaps image_label's placeholder for frame_view while streaming, and back."""
+        if not streaming:
+            self.frame_view.clear_frame() # Don't show the last frame when the next session starts
+        self.image_label.setVisible(not streaming)
+        self.frame_view.setVisible(streaming)
+
     def closeEvent(self, event):
         # Ensure all sockets are closed and threads are stopped on application exit
         self.stop_client_session() # Stop client if active